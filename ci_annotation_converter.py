@@ -5,12 +5,15 @@ import argparse
 import contextlib
 import dataclasses
 import enum
-import hashlib
+import functools
+import io
 import json
 import sys
 from abc import abstractmethod
+from collections.abc import Callable, Generator, Iterable
 from typing import (
     Any,
+    BinaryIO,
     ClassVar,
     Literal,
     NotRequired,
@@ -20,10 +23,10 @@ from typing import (
     override,
 )
 
-import schema as s
+import orjson
 
 
-class Severity(enum.Enum):
+class Severity(enum.IntEnum):
     NONE = 0
     DEBUG = enum.auto()
     INFO = enum.auto()
@@ -32,7 +35,15 @@ class Severity(enum.Enum):
     CRIT = enum.auto()
 
 
-@dataclasses.dataclass(frozen=True)
+# Annotations below this level are dropped before reaching output adapters
+MIN_SEVERITY = Severity.WARN
+
+
+# Treat as immutable; only the cached fingerprint is ever assigned after
+# construction. Not frozen, because frozen __init__ is several times slower;
+# unsafe_hash keeps instances hashable (from the compared fields, not _fp)
+# as they were while frozen.
+@dataclasses.dataclass(slots=True, unsafe_hash=True)
 class AnnotationItem:
     tool_id: str
     path: str
@@ -45,23 +56,50 @@ class AnnotationItem:
     message: str
     detail: str | None = dataclasses.field(default=None, repr=False)
     href: str | None = dataclasses.field(default=None, repr=False)
-    fingerprint: str = dataclasses.field(init=False, repr=False)
+    _fp: str | None = dataclasses.field(
+        default=None, init=False, repr=False, compare=False
+    )
 
-    def __post_init__(self) -> None:
-        m = hashlib.md5(usedforsecurity=False)
-        m.update(repr(self).encode(encoding="utf-8"))
-        object.__setattr__(self, "fingerprint", m.hexdigest())
+    @property
+    def fingerprint(self) -> str:
+        if self._fp is None:
+            import hashlib
+
+            key = (
+                f"{self.tool_id}|{self.path}|{self.start_line}|{self.end_line}|"
+                f"{self.start_col}|{self.end_col}|{self.level.name}|{self.title}|"
+                f"{self.message}"
+            )
+            m = hashlib.blake2b(key.encode(encoding="utf-8"), digest_size=16)
+            self._fp = m.hexdigest()
+        return self._fp
+
+    @fingerprint.setter
+    def fingerprint(self, value: str) -> None:
+        self._fp = value
 
 
 class InputAdapter(abc.ABC):
     registry: ClassVar[dict[str, type[InputAdapter]]] = {}
     id: ClassVar[str]
-    schema: ClassVar[s.Schema]
+    schema: ClassVar[dict[str, Any]]
     severity_map: ClassVar[dict[str, Severity]]
 
+    @classmethod
+    @functools.cache
+    def validator(cls) -> Callable[[Any], Any]:
+        # Compiled on first use, so only the adapter in use pays for it,
+        # and --fast never imports fastjsonschema at all
+        import fastjsonschema  # pyright: ignore[reportMissingTypeStubs]
+
+        return cast(
+            Callable[[Any], Any],
+            fastjsonschema.compile(cls.schema),  # pyright: ignore[reportUnknownMemberType]
+        )
+
     @classmethod
     @abstractmethod
-    def from_file(cls, infile: TextIO) -> list[AnnotationItem]:
+    def from_file(cls, infile: BinaryIO, fast: bool = False) -> list[AnnotationItem]:
         pass
 
     def __init_subclass__(cls) -> None:
@@ -72,7 +110,8 @@ class InputAdapter(abc.ABC):
 class OutputAdapter(abc.ABC):
     registry: ClassVar[dict[str, type[OutputAdapter]]] = {}
     id: ClassVar[str]
-    severity_map: ClassVar[dict[Severity, str]]
+    # Indexed by Severity value
+    severity_map: ClassVar[tuple[str, ...]]
 
     @classmethod
     @abstractmethod
@@ -81,26 +120,56 @@ class OutputAdapter(abc.ABC):
 
     def __init_subclass__(cls) -> None:
         super().__init_subclass__()
+        # Checked once here so that to_file() can index the map blindly
+        if len(cls.severity_map) != len(Severity):
+            raise TypeError(
+                f"{cls.__name__}.severity_map needs one entry per Severity member"
+            )
         cls.registry[cls.id] = cls
 
 
 class PyrightAdapter(InputAdapter):
     id = "pyright"
 
-    schema = s.Schema({
-        "file": str,
-        "severity": s.Or(
-            s.Schema("information"),
-            s.Schema("warning"),
-            s.Schema("error"),
-        ),
-        "message": str,
-        "range": {
-            "start": {"line": int, "character": int},
-            "end": {"line": int, "character": int},
+    _position = {
+        "type": "object",
+        "properties": {
+            "line": {"type": "integer"},
+            "character": {"type": "integer"},
         },
-        s.Optional("rule"): str,
-    })
+        "required": ["line", "character"],
+        "additionalProperties": False,
+    }
+
+    schema = {
+        "type": "object",
+        "properties": {
+            "generalDiagnostics": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "file": {"type": "string"},
+                        "severity": {"enum": ["information", "warning", "error"]},
+                        "message": {"type": "string"},
+                        "range": {
+                            "type": "object",
+                            "properties": {
+                                "start": _position,
+                                "end": _position,
+                            },
+                            "required": ["start", "end"],
+                            "additionalProperties": False,
+                        },
+                        "rule": {"type": "string"},
+                    },
+                    "required": ["file", "severity", "message", "range"],
+                    "additionalProperties": False,
+                },
+            },
+        },
+        "required": ["generalDiagnostics"],
+    }
 
     severity_map = {
         "information": Severity.INFO,
@@ -110,7 +179,7 @@ class PyrightAdapter(InputAdapter):
 
     @override
     @classmethod
-    def from_file(cls, infile: TextIO) -> list[AnnotationItem]:
+    def from_file(cls, infile: BinaryIO, fast: bool = False) -> list[AnnotationItem]:
         class _PyrightDiagPosition(TypedDict):
             line: int
             character: int
@@ -126,22 +195,32 @@ class PyrightAdapter(InputAdapter):
             range: _PyrightDiagRange
             rule: NotRequired[str]
 
-        report = json.load(infile)
+        class _PyrightReport(TypedDict):
+            generalDiagnostics: list[_PyrightDiagItem]
+
+        report = orjson.loads(infile.read())
+        if not fast:
+            report = cls.validator()(report)
+        report = cast(_PyrightReport, report)
         result: list[AnnotationItem] = []
-        for item in report["generalDiagnostics"]:
-            diag = cast(_PyrightDiagItem, cls.schema.validate(item))
-            anno_item = AnnotationItem(
-                cls.id,
+        tool_id = cls.id
+        severity_map = cls.severity_map
+        append = result.append
+        for diag in report["generalDiagnostics"]:
+            rng = diag["range"]
+            start = rng["start"]
+            end = rng["end"]
+            append(AnnotationItem(
+                tool_id,
                 diag["file"],
-                diag["range"]["start"]["line"] + 1,
-                diag["range"]["end"]["line"] + 1,
-                diag["range"]["start"]["character"] + 1,
-                diag["range"]["end"]["character"] + 1,
-                cls.severity_map[diag["severity"]],
+                start["line"] + 1,
+                end["line"] + 1,
+                start["character"] + 1,
+                end["character"] + 1,
+                severity_map[diag["severity"]],
                 diag["rule"] if "rule" in diag else "",
                 diag["message"],
-            )
-            result.append(anno_item)
+            ))
         return result
 
 
@@ -152,22 +231,43 @@ class BasedpyrightAdapter(PyrightAdapter):
 class PyreflyAdapter(InputAdapter):
     id = "pyrefly"
 
-    schema = s.Schema({
-        "line": int,
-        "column": int,
-        "stop_line": int,
-        "stop_column": int,
-        "path": str,
-        "code": int,
-        "name": str,
-        "description": str,
-        "concise_description": str,
-        "severity": s.Or(
-            s.Schema("info"),
-            s.Schema("warning"),
-            s.Schema("error"),
-        ),
-    })
+    schema = {
+        "type": "object",
+        "properties": {
+            "errors": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "line": {"type": "integer"},
+                        "column": {"type": "integer"},
+                        "stop_line": {"type": "integer"},
+                        "stop_column": {"type": "integer"},
+                        "path": {"type": "string"},
+                        "code": {"type": "integer"},
+                        "name": {"type": "string"},
+                        "description": {"type": "string"},
+                        "concise_description": {"type": "string"},
+                        "severity": {"enum": ["info", "warning", "error"]},
+                    },
+                    "required": [
+                        "line",
+                        "column",
+                        "stop_line",
+                        "stop_column",
+                        "path",
+                        "code",
+                        "name",
+                        "description",
+                        "concise_description",
+                        "severity",
+                    ],
+                    "additionalProperties": False,
+                },
+            },
+        },
+        "required": ["errors"],
+    }
 
     severity_map = {
         "info": Severity.INFO,
@@ -177,7 +277,7 @@ class PyreflyAdapter(InputAdapter):
 
     @override
     @classmethod
-    def from_file(cls, infile: TextIO) -> list[AnnotationItem]:
+    def from_file(cls, infile: BinaryIO, fast: bool = False) -> list[AnnotationItem]:
         class _PyreflyDiagItem(TypedDict):
             line: int
             column: int
@@ -190,48 +290,55 @@ class PyreflyAdapter(InputAdapter):
             concise_description: str
             severity: Literal["info", "warning", "error"]
 
+        class _PyreflyReport(TypedDict):
+            errors: list[_PyreflyDiagItem]
+
+        data = infile.read()
         try:
-            report = json.load(infile)
-        except Exception:
+            report = orjson.loads(data)
+        except orjson.JSONDecodeError:
             # pyrefly (circa 0.47.0) appends github text formatted annotation at the end of json output
             decoder = json.JSONDecoder()
-            _ = infile.seek(0, 0)
-            report, _ = decoder.raw_decode(infile.read())
-        result: list[AnnotationItem] = []
-        for item in report["errors"]:
-            diag = cast(_PyreflyDiagItem, cls.schema.validate(item))
-            anno_item = AnnotationItem(
-                cls.id,
+            report, _ = decoder.raw_decode(data.decode(encoding="utf-8"))
+        if not fast:
+            report = cls.validator()(report)
+        report = cast(_PyreflyReport, report)
+        tool_id = cls.id
+        severity_map = cls.severity_map
+        return [
+            AnnotationItem(
+                tool_id,
                 diag["path"],
                 diag["line"],
                 diag["stop_line"],
                 diag["column"],
                 diag["stop_column"],
-                cls.severity_map[diag["severity"]],
+                severity_map[diag["severity"]],
                 diag["name"],
                 diag["concise_description"],
                 diag["description"],
             )
-            result.append(anno_item)
-        return result
+            for diag in report["errors"]
+        ]
 
 
 class MypyAdapter(InputAdapter):
     id = "mypy"
 
-    schema = s.Schema({
-        "file": str,
-        "line": int,
-        "column": int,
-        "message": str,
-        "hint": s.Or(str, s.Schema(None)),
-        "code": s.Or(str, s.Schema(None)),
-        "severity": s.Or(
-            s.Schema("note"),
-            s.Schema("warning"),
-            s.Schema("error"),
-        ),
-    })
+    schema = {
+        "type": "object",
+        "properties": {
+            "file": {"type": "string"},
+            "line": {"type": "integer"},
+            "column": {"type": "integer"},
+            "message": {"type": "string"},
+            "hint": {"type": ["string", "null"]},
+            "code": {"type": ["string", "null"]},
+            "severity": {"enum": ["note", "warning", "error"]},
+        },
+        "required": ["file", "line", "column", "message", "hint", "code", "severity"],
+        "additionalProperties": False,
+    }
 
     severity_map = {
         "note": Severity.INFO,
@@ -241,7 +348,7 @@ class MypyAdapter(InputAdapter):
 
     @override
     @classmethod
-    def from_file(cls, infile: TextIO) -> list[AnnotationItem]:
+    def from_file(cls, infile: BinaryIO, fast: bool = False) -> list[AnnotationItem]:
         class _MypyDiagItem(TypedDict):
             file: str
             line: int
@@ -251,53 +358,79 @@ class MypyAdapter(InputAdapter):
             code: str | None
             severity: Literal["note", "warning", "error"]
 
-        json_str = "[" + ",".join([line.strip() for line in infile.readlines()]) + "]"
-        result: list[AnnotationItem] = []
-        for item in json.loads(json_str):
-            diag = cast(_MypyDiagItem, cls.schema.validate(item))
-            anno_item = AnnotationItem(
-                cls.id,
+        tool_id = cls.id
+        severity_map = cls.severity_map
+        # Lazily decoded one line at a time, so the report is never held whole
+        diags = (orjson.loads(line) for line in infile if line.strip())
+        if not fast:
+            diags = map(cls.validator(), diags)
+        return [
+            AnnotationItem(
+                tool_id,
                 diag["file"],
                 diag["line"],
                 None,  # only available with --show-error-end and text output
                 diag["column"] + 1,  # WTF
                 None,
-                cls.severity_map[diag["severity"]],
+                severity_map[diag["severity"]],
                 diag["code"],
                 diag["message"],
                 diag["hint"] or None,
             )
-            result.append(anno_item)
-        return result
+            for diag in cast(Iterable[_MypyDiagItem], diags)
+        ]
 
 
 class TyAdapter(InputAdapter):
     id = "ty"
 
-    schema = s.Schema({
-        "check_name": str,
-        "description": str,
-        "severity": s.Or(
-            s.Schema("info"),
-            s.Schema("minor"),
-            s.Schema("major"),
-            s.Schema("critical"),
-        ),
-        "fingerprint": str,
-        "location": {
-            "path": str,
-            "positions": {
-                "begin": {
-                    "line": int,
-                    "column": int,
-                },
-                "end": {
-                    "line": int,
-                    "column": int,
+    _position = {
+        "type": "object",
+        "properties": {
+            "line": {"type": "integer"},
+            "column": {"type": "integer"},
+        },
+        "required": ["line", "column"],
+        "additionalProperties": False,
+    }
+
+    schema = {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {
+                "check_name": {"type": "string"},
+                "description": {"type": "string"},
+                "severity": {"enum": ["info", "minor", "major", "critical"]},
+                "fingerprint": {"type": "string"},
+                "location": {
+                    "type": "object",
+                    "properties": {
+                        "path": {"type": "string"},
+                        "positions": {
+                            "type": "object",
+                            "properties": {
+                                "begin": _position,
+                                "end": _position,
+                            },
+                            "required": ["begin", "end"],
+                            "additionalProperties": False,
+                        },
+                    },
+                    "required": ["path", "positions"],
+                    "additionalProperties": False,
                 },
             },
+            "required": [
+                "check_name",
+                "description",
+                "severity",
+                "fingerprint",
+                "location",
+            ],
+            "additionalProperties": False,
         },
-    })
+    }
 
     severity_map = {
         "info": Severity.INFO,
@@ -308,7 +441,7 @@ class TyAdapter(InputAdapter):
 
     @override
     @classmethod
-    def from_file(cls, infile: TextIO) -> list[AnnotationItem]:
+    def from_file(cls, infile: BinaryIO, fast: bool = False) -> list[AnnotationItem]:
         class _TyDiagPosition(TypedDict):
             line: int
             column: int
@@ -324,54 +457,59 @@ class TyAdapter(InputAdapter):
             fingerprint: str
             location: _TyDiagLocation
 
-        report = json.load(infile)
+        report = orjson.loads(infile.read())
+        if not fast:
+            report = cls.validator()(report)
+        report = cast(list[_TyDiagItem], report)
         result: list[AnnotationItem] = []
-        for item in report:
-            diag = cast(_TyDiagItem, cls.schema.validate(item))
-            begin_pos = diag["location"]["positions"]["begin"]
-            end_pos = diag["location"]["positions"]["end"]
+        tool_id = cls.id
+        severity_map = cls.severity_map
+        append = result.append
+        for diag in report:
+            location = diag["location"]
+            positions = location["positions"]
+            begin_pos = positions["begin"]
+            end_pos = positions["end"]
             anno_item = AnnotationItem(
-                cls.id,
-                diag["location"]["path"],
+                tool_id,
+                location["path"],
                 begin_pos["line"],
                 end_pos["line"],
                 begin_pos["column"],
                 end_pos["column"],
-                cls.severity_map[diag["severity"]],
+                severity_map[diag["severity"]],
                 diag["check_name"],
                 diag["description"],
             )
-            object.__setattr__(anno_item, "fingerprint", diag["fingerprint"])
-            result.append(anno_item)
+            anno_item.fingerprint = diag["fingerprint"]
+            append(anno_item)
         return result
 
 
 class GitHubJsonAdapter(OutputAdapter):
     id = "github-json"
 
-    severity_map = {
-        Severity.DEBUG: "debug",
-        Severity.INFO: "notice",
-        Severity.WARN: "warning",
-        Severity.ERROR: "error",
-    }
+    severity_map = (
+        "debug",  # NONE
+        "debug",  # DEBUG
+        "notice",  # INFO
+        "warning",  # WARN
+        "error",  # ERROR
+        "error",  # CRIT
+    )
 
     @override
     @classmethod
     def to_file(cls, annotations: list[AnnotationItem], outfile: TextIO) -> int:
-        result: list[dict[str, str | int | None]] = []
-        count = 0
-        for item in annotations:
-            if item.level.value < Severity.WARN.value:
-                continue
-            count += 1
-            anno_item = {
+        severity_map = cls.severity_map
+        result: list[dict[str, str | int | None]] = [
+            {
                 "path": item.path,
                 "start_line": item.start_line,
                 "end_line": item.end_line,
                 "start_column": item.start_col,
                 "end_column": item.end_col,
-                "annotation_level": cls.severity_map[item.level],
+                "annotation_level": severity_map[item.level],
                 "title": (
                     f"{item.tool_id} ({item.title})" if item.title else item.tool_id
                 ),
@@ -379,113 +517,128 @@ class GitHubJsonAdapter(OutputAdapter):
                 "raw_details": item.detail,
                 "blob_href": item.href,
             }
-            result.append(anno_item)
-        json.dump(result, outfile, indent=2)
-        return count
+            for item in annotations
+        ]
+        _ = outfile.write(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
+        return len(result)
 
 
 class GitHubTextAdapter(OutputAdapter):
     id = "github-text"
 
-    severity_map = {
-        Severity.DEBUG: "debug",
-        Severity.INFO: "notice",
-        Severity.WARN: "warning",
-        Severity.ERROR: "error",
-    }
+    severity_map = (
+        "debug",  # NONE
+        "debug",  # DEBUG
+        "notice",  # INFO
+        "warning",  # WARN
+        "error",  # ERROR
+        "error",  # CRIT
+    )
+
+    # Windows path separators must be escaped, and newlines are not
+    # allowed in workflow command parameters or messages
+    _path_table = str.maketrans({"\\": "\\\\"})
+    _title_table = str.maketrans({"\r": "", "\n": " "})
+    _message_table = str.maketrans({"\n": "%0A"})
 
     @override
     @classmethod
     def to_file(cls, annotations: list[AnnotationItem], outfile: TextIO) -> int:
-        count = 0
+        severity_map = cls.severity_map
+        path_table = cls._path_table
+        title_table = cls._title_table
+        message_table = cls._message_table
+        lines: list[str] = []
+        append = lines.append
         for item in annotations:
-            if item.level.value < Severity.WARN.value:
-                continue
-            count += 1
-            optional_params: list[str] = []
-            optional_params.append(f"file={item.path.replace(chr(92), '\\\\')}")
-            if item.start_line is not None:
-                optional_params.append(f"line={item.start_line}")
-            if item.start_col is not None:
-                optional_params.append(f"col={item.start_col}")
-            if item.end_line is not None:
-                optional_params.append(f"endLine={item.end_line}")
-            if item.end_col is not None:
-                optional_params.append(f"endColumn={item.end_col}")
+            path = item.path.translate(path_table)
+            start_line = "" if item.start_line is None else f",line={item.start_line}"
+            start_col = "" if item.start_col is None else f",col={item.start_col}"
+            end_line = "" if item.end_line is None else f",endLine={item.end_line}"
+            end_col = "" if item.end_col is None else f",endColumn={item.end_col}"
             title = f"{item.tool_id} ({item.title})" if item.title else item.tool_id
-            optional_params.append(
-                f"title={title.replace("\r", '').replace("\n", ' ')}"
-            )
+            title = title.translate(title_table)
             message = item.message + (f"\n{item.detail}" if item.detail else "")
-
-            formatted_message = "::{} {}::{}\n".format(
-                cls.severity_map[item.level],
-                ",".join(optional_params),
-                message.replace("\n", "%0A"),
-            )
-            _ = outfile.write(formatted_message)
-        return count
+            message = message.translate(message_table)
+            params = f"file={path}{start_line}{start_col}{end_line}{end_col},title={title}"
+            append(f"::{severity_map[item.level]} {params}::{message}\n")
+        _ = outfile.write("".join(lines))
+        return len(annotations)
 
 
 class GitLabCodeQualityAdapter(OutputAdapter):
     id = "gitlab-json"
 
-    severity_map = {
-        Severity.INFO: "info",
-        Severity.WARN: "minor",
-        Severity.ERROR: "major",
-    }
+    severity_map = (
+        "info",  # NONE
+        "info",  # DEBUG
+        "info",  # INFO
+        "minor",  # WARN
+        "major",  # ERROR
+        "critical",  # CRIT
+    )
 
     @override
     @classmethod
     def to_file(cls, annotations: list[AnnotationItem], outfile: TextIO) -> int:
         gl_annotations: list[dict[str, Any]] = []
-        count = 0
+        severity_map = cls.severity_map
+        append = gl_annotations.append
         for item in annotations:
-            if item.level.value < Severity.WARN.value:
-                continue
-            count += 1
-            anno_item: dict[str, Any] = {
+            begin = {"line": item.start_line or 1}
+            if item.start_col:
+                begin["column"] = item.start_col
+            positions = {"begin": begin}
+            if item.end_line:
+                end = {"line": item.end_line}
+                if item.end_col:
+                    end["column"] = item.end_col
+                positions["end"] = end
+            append({
                 "description": item.message,  # TODO add item.hint
                 "check_name": (
                     f"{item.tool_id} ({item.title})" if item.title else item.tool_id
                 ),
                 "fingerprint": item.fingerprint,
-                "severity": cls.severity_map[item.level],
-                "location": {
-                    "path": item.path,
-                    "positions": {
-                        "begin": {
-                            "line": item.start_line or 1,
-                        },
-                    },
-                },
-            }
-            if item.end_line:
-                anno_item["location"]["positions"]["end"] = {}
-                anno_item["location"]["positions"]["end"]["line"] = item.end_line
-            if item.start_col:
-                anno_item["location"]["positions"]["begin"]["column"] = item.start_col
-            if item.end_col:
-                anno_item["location"]["positions"]["end"]["column"] = item.end_col
-            gl_annotations.append(anno_item)
-        json.dump(gl_annotations, outfile, indent=2)
-        return count
+                "severity": severity_map[item.level],
+                "location": {"path": item.path, "positions": positions},
+            })
+        _ = outfile.write(orjson.dumps(gl_annotations, option=orjson.OPT_INDENT_2).decode())
+        return len(gl_annotations)
+
+
+@contextlib.contextmanager
+def _utf8_stdout() -> Generator[TextIO]:
+    # orjson emits raw UTF-8 rather than \u escapes, so don't rely on the
+    # encoding of stdout (e.g. cp1252 when redirected on Windows). The
+    # wrapper is detached afterwards to leave sys.stdout itself untouched.
+    stdout = sys.stdout
+    if not isinstance(stdout, io.TextIOWrapper):
+        yield stdout
+        return
+    _ = stdout.flush()
+    wrapper = io.TextIOWrapper(stdout.buffer, encoding="utf-8")
+    try:
+        yield wrapper
+    finally:
+        _ = wrapper.detach()
 
 
 def main() -> None:
+    input_formats = InputAdapter.registry.keys()
+    output_formats = OutputAdapter.registry.keys()
     argparser = argparse.ArgumentParser(description="Conversion from program output to CI/CD annotation formats")
     _ = argparser.add_argument(
         "informat",
-        choices=InputAdapter.registry.keys(),
+        choices=input_formats,
         metavar="INPUT_FORMAT",
-        help="Choose from: " + ", ".join(InputAdapter.registry.keys()),
+        help="Choose from: " + ", ".join(input_formats),
     )
     _ = argparser.add_argument(
         "outformat",
-        choices=OutputAdapter.registry.keys(),
+        choices=output_formats,
         metavar="OUTPUT_FORMAT",
-        help="Choose from: " + ", ".join(OutputAdapter.registry.keys()),
+        help="Choose from: " + ", ".join(output_formats),
     )
     _ = argparser.add_argument(
         "-i",
@@ -502,23 +655,33 @@ def main() -> None:
         action="store_true",
         help="Exit with non-zero status upon annotation",
     )
+    _ = argparser.add_argument(
+        "--fast",
+        action="store_true",
+        help="Skip input validation (malformed input fails with KeyError or TypeError)",
+    )
     args = argparser.parse_args()
 
     if args.i is None:
-        cm = contextlib.nullcontext(sys.stdin)
+        cm = contextlib.nullcontext(sys.stdin.buffer)
     else:
-        cm = open(args.i, "r", encoding="utf-8")
+        cm = open(args.i, "rb")
 
     with cm as infile:
-        annotations = getattr(InputAdapter.registry[args.informat], "from_file")(infile)
+        annotations = InputAdapter.registry[args.informat].from_file(infile, fast=args.fast)
+
+    annotations = sorted(
+        (item for item in annotations if item.level >= MIN_SEVERITY),
+        key=lambda item: (item.path, item.start_line or 0),
+    )
 
     if args.o is None:
-        cm = contextlib.nullcontext(sys.stdout)
+        cm = _utf8_stdout()
     else:
         cm = open(args.o, "w", encoding="utf-8")
 
     with cm as outfile:
-        status = getattr(OutputAdapter.registry[args.outformat], "to_file")(annotations, outfile)
+        status = OutputAdapter.registry[args.outformat].to_file(annotations, outfile)
 
     if args.e is True:
         exit(status)